@@ -1,24 +1,21 @@
 #not working for use yet
 
 import os
+import hl7_search
 
 path = r'\\whsrhaparch1\RhapsodyHL7FileLogs_Prod\MasterLog'
-os.chdir(path)
-files = os.listdir()
-folders = list(filter(lambda x: not x.endswith('zip'), files))
+# One pass over the listing, skipping zips
+with os.scandir(path) as entries:
+    folders = [entry.path for entry in entries if not entry.name.endswith('zip') and entry.is_dir()]
 
 searchterm = '999999999'
+# Encode once up front, the logs are searched as raw bytes
+searchterm_b = searchterm.encode('utf-8')
 
-for afolder in folders:
-    path2 = os.path.join(path, afolder)
-    files2 = os.listdir(path2)
-    for afile in files2:
-        filepath = os.path.join(path2, afile)
-        with open(filepath, 'r') as f:
-            read_data = f.read()
-            hl7_list = read_data.split('======')
-            for hl7message in hl7_list:
-                if searchterm in hl7message:
-                    print(filepath)
-                    print(hl7message)
-                    print('')
\ No newline at end of file
+for path2 in folders:
+    # scandir knows which entries are files, no join or extra stat needed
+    for filepath in hl7_search.list_files(path2):
+        # Big files are memory-mapped and searched in place, not read in
+        for hl7message in hl7_search.scan_file(filepath, searchterm_b):
+            # One print per match rather than one per line
+            print(filepath, hl7_search.fix_line_endings(hl7message).decode('utf-8', errors='replace'), '', sep='\n')
@@ -0,0 +1,206 @@
+'''
+Search code shared by the HL7 log finder scripts.
+It finds the Rhapsody log folders for a date range and pulls
+out every HL7 message that has the searchterm in it.
+The logs are searched as raw bytes, so the messages come back
+as bytes too.'''
+
+import os
+import json
+import mmap
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+separator = b'======'
+
+# Log folders are named starting with their date as YYYYMMDD
+folder_date_re = re.compile(r'[0-9]{8}')
+
+# Number of folders or files read from the share at the same time
+max_workers = 32
+
+# Folder listings are kept in this file between runs, listing the share is slow.
+# The list of date folders is trusted for listing_cache_ttl seconds, the files
+# in a date folder for as long as the folder's modified time doesn't change.
+# A folder's files are dropped from the cache once it hasn't been searched
+# for listing_cache_days, so the file doesn't keep growing
+listing_cache_path = 'hl7_listing_cache.json'
+listing_cache_ttl = 300
+listing_cache_days = 7
+
+
+def load_listing_cache():
+    '''Return the folder listings saved by earlier runs'''
+    try:
+        with open(listing_cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'share': {}, 'folders': {}}
+
+
+def save_listing_cache(cache):
+    '''Save the folder listings for the next run, it doesn't matter if this fails'''
+    now = time.time()
+    cache['share'] = {path: saved for path, saved in cache['share'].items()
+                      if now - saved['time'] < listing_cache_ttl}
+    cache['folders'] = {folder: saved for folder, saved in cache['folders'].items()
+                        if now - saved.get('used', 0) < listing_cache_days * 86400}
+    try:
+        with open(listing_cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+
+def list_date_folders(path, cache=None):
+    '''Return (folder path, YYYYMMDD date) for every dated log folder in path.
+    With a cache from load_listing_cache, a listing from the last
+    listing_cache_ttl seconds is reused instead of listing the share again'''
+    if cache is not None:
+        saved = cache['share'].get(path)
+        if saved and time.time() - saved['time'] < listing_cache_ttl:
+            return [tuple(entry) for entry in saved['entries']]
+    # scandir gives back the name, full path and type of each entry
+    # from the one directory listing, zips and undated entries are skipped
+    with os.scandir(path) as entries:
+        dated_folders = [(entry.path, entry.name[:8]) for entry in entries
+                         if folder_date_re.match(entry.name) and not entry.name.endswith('zip') and entry.is_dir()]
+    if cache is not None:
+        cache['share'][path] = {'time': time.time(), 'entries': dated_folders}
+    return dated_folders
+
+
+def dated_folders_between(path, date_greater_than, date_less_than, cache=None):
+    '''Return the paths of the log folders in path dated after date_greater_than
+    and before date_less_than, both given as YYYYMMDD'''
+    if not (folder_date_re.fullmatch(date_greater_than) and folder_date_re.fullmatch(date_less_than)):
+        raise ValueError('date_greater_than and date_less_than must be YYYYMMDD')
+    # YYYYMMDD strings sort the same way as the dates, so the folder names
+    # can be compared as text without turning them into numbers
+    return [folder for folder, folder_date in list_date_folders(path, cache)
+            if date_greater_than < folder_date < date_less_than]
+
+
+def list_files(folder, skip_empty=True):
+    '''Return the paths of all the log files in a folder'''
+    # On Windows the size comes with the directory listing, so empty
+    # files are skipped without ever being opened over the share
+    with os.scandir(folder) as entries:
+        return [entry.path for entry in entries
+                if entry.is_file(follow_symlinks=False)
+                and not (skip_empty and entry.stat(follow_symlinks=False).st_size == 0)]
+
+
+def list_files_cached(folder, cache):
+    '''Return the paths of all the log files in a folder, reusing the listing
+    from an earlier run if the folder hasn't been modified since'''
+    mtime = os.stat(folder).st_mtime_ns
+    saved = cache['folders'].get(folder)
+    if saved and saved['mtime'] == mtime:
+        saved['used'] = time.time()
+        return saved['files']
+    # Empty files are kept, a file filling up doesn't change the folder's
+    # modified time so it could otherwise be left out of later runs
+    files = list_files(folder, skip_empty=False)
+    cache['folders'][folder] = {'mtime': mtime, 'files': files, 'used': time.time()}
+    return files
+
+
+def list_log_files(folders, cache=None):
+    '''Return the paths of all the log files in the folders, listing them in parallel'''
+    all_files = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        if cache is None:
+            listings = pool.map(list_files, folders)
+        else:
+            listings = pool.map(list_files_cached, folders, repeat(cache))
+        for files in listings:
+            all_files.extend(files)
+    return all_files
+
+
+def find_messages(data, searchterm_b):
+    '''Return every message in data (bytes or an mmap) that has searchterm_b in it'''
+    sep = separator
+    # Every message has an empty term in it
+    if not searchterm_b:
+        return data[:].split(sep)
+    messages = []
+    # Everything used per hit is bound to a local once, up front
+    find = data.find
+    rfind = data.rfind
+    sep_len = len(sep)
+    data_len = len(data)
+    # Jump from hit to hit and cut out the message around each one,
+    # so only the search term is scanned for across the file
+    pos = find(searchterm_b)
+    while pos >= 0:
+        start = rfind(sep, 0, pos)
+        start = 0 if start < 0 else start + sep_len
+        end = find(sep, start)
+        if end < 0:
+            end = data_len
+        message = data[start:end]
+        # A hit can run into a separator (if the term has = in it),
+        # then it isn't in a message and the search goes on past it
+        if searchterm_b in message:
+            messages.append(message)
+            pos = find(searchterm_b, end + sep_len)
+        else:
+            pos = find(searchterm_b, pos + 1)
+    return messages
+
+
+def fix_line_endings(message):
+    '''Return the message with the carriage returns that end each segment
+    turned into newlines, the same as reading the log in text mode did.
+    Printed as they are, each segment would write over the one before'''
+    return message.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+
+# On Windows O_SEQUENTIAL opens files for a sequential scan, so reads
+# over the share are prefetched ahead, it doesn't exist anywhere else
+open_flags = getattr(os, 'O_SEQUENTIAL', 0)
+
+
+def open_sequential(filepath, flags):
+    '''Opener for open() that adds open_flags'''
+    return os.open(filepath, flags | open_flags)
+
+
+def scan_file(filepath, searchterm_b):
+    '''Return every HL7 message in the file that has searchterm_b in it'''
+    with open(filepath, 'rb', opener=open_sequential) as f:
+        # Map big files instead of copying them into memory, small ones
+        # (and empty ones, which can't be mapped) are cheaper to just read
+        if os.fstat(f.fileno()).st_size < 64 * 1024:
+            return find_messages(f.read(), searchterm_b)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # The file is scanned front to back, so let the OS read ahead
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        return find_messages(mm, searchterm_b)
+    finally:
+        mm.close()
+
+
+def search_files(files, searchterm):
+    '''Yield (filepath, messages) for each file, in the order given.
+    The files are scanned in parallel so the share is never waiting on one read'''
+    searchterm_b = searchterm.encode('utf-8')
+    # Only a few files are scanned ahead of the one being yielded, so one
+    # slow file can't leave the matches of every file after it in memory
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for filepath in files:
+            pending.append((filepath, pool.submit(scan_file, filepath, searchterm_b)))
+            if len(pending) >= 2 * max_workers:
+                filepath, future = pending.popleft()
+                yield filepath, future.result()
+        while pending:
+            filepath, future = pending.popleft()
+            yield filepath, future.result()
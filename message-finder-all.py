@@ -1,61 +1,50 @@
 # Input Variables
 searchterm = '9999999'
 date_greater_than = '20210609'
-date_less_than = '202106011'
+date_less_than = '20210611'
 
-import os
 import datetime
+import time
+import hl7_search
 
-# Make dates numbers
-date_greater_than=int(date_greater_than)
-date_less_than = int(date_less_than)
-
-# Create Output file (causes permission errors)
+path = r'\\whsrhaparch1\RhapsodyHL7FileLogs_Prod\MasterLog'
 
-outputfilename = 'OUTPUT-'
-datetime_str = str(datetime.datetime.now())
-datetime_str = datetime_str.replace('.', '_')
-datetime_str = datetime_str.replace(':', '-')
-filetype = '.md'
-outputfilename = outputfilename + datetime_str + filetype
-outputfilename = str(outputfilename)
-out_file = open(outputfilename, 'x')
-out_file.writelines('# HL7 Search Results' + '\n')
-out_file.close()
+# Reuse the folder listings from earlier runs where they are still current
+listing_cache = hl7_search.load_listing_cache()
 
+# Filter folders for dates between the two dates
+filtered_folders = hl7_search.dated_folders_between(path, date_greater_than, date_less_than, listing_cache)
 
-path = r'\\whsrhaparch1\RhapsodyHL7FileLogs_Prod\MasterLog'
-os.chdir(path)
-files = os.listdir()
-folders = list(filter(lambda x: not x.endswith('zip'), files))
+# Create Output file, it stays open so each match is written as it is found
 
-# Filter folders for date greater than this number
-filtered_folders = []
-
-for item in folders:
-    folder_date = item[0:8]
-    folder_date = int(folder_date)
-    if ((folder_date > date_greater_than) and (folder_date < date_less_than)):
-        filtered_folders.append(item)
+outputfilename = datetime.datetime.now().strftime('OUTPUT-%Y-%m-%d %H-%M-%S_%f.md')
+out_file = open(outputfilename, 'xb', buffering=1 << 20)
+out_file.write(b'# HL7 Search Results\n')
+# Each match is written with one format of this template: path, then message
+match_template = b'##%s\n%s\n'
 
 string = '# HL7 Results'
 print('# HL7 Search Results')
-for afolder in filtered_folders:
-    path2 = os.path.join(path, afolder)
-    files2 = os.listdir(path2)
-    for afile in files2:
-        filepath = os.path.join(path2, afile)
-        with open(filepath, 'r') as f:
-            read_data = f.read()
-            hl7_list = read_data.split('======')
-            for hl7message in hl7_list:
-                if searchterm in hl7message:
-                    #print('## ', filepath)
-                    #print(hl7message)              
-                    # Below Has Permission Errors
-                    
-                    out_file = open(outputfilename, 'w')
-                    out_file.writelines('##' + filepath + '\n')
-                    out_file.writelines( hl7message + '\n')
-                    print('wrote HL7 message to file')
-                    out_file.close()
+
+# The folders are listed and the files scanned in parallel,
+# results still come back in file order
+found = 0
+next_tick = time.monotonic()
+try:
+    all_files = hl7_search.list_log_files(filtered_folders, listing_cache)
+    hl7_search.save_listing_cache(listing_cache)
+    results = hl7_search.search_files(all_files, searchterm)
+    for done, (filepath, hl7_list) in enumerate(results, 1):
+        # Messages are written out as bytes, with newlines ending the segments
+        filepath_b = filepath.encode('utf-8')
+        for hl7message in hl7_list:
+            out_file.write(match_template % (filepath_b, hl7_search.fix_line_endings(hl7message)))
+            found += 1
+        # Printing on every match slows the scan down, report about once a second
+        now = time.monotonic()
+        if now >= next_tick:
+            print('scanned', done, 'of', len(all_files), 'files,', found, 'messages found')
+            next_tick = now + 1
+finally:
+    out_file.close()
+print('wrote', found, 'HL7 messages to', outputfilename)
\ No newline at end of file
@@ -11,21 +11,17 @@ output_filename = 'OUTPUT.xlsx'
 output_file_path = path + r'\\' + output_filename
 
 # Import Libs
-import os
 import pandas as pd
+import hl7_search
 
 # Get a list of all the log files
-hl7_log_files = os.listdir(path)
+hl7_log_files = hl7_search.list_files(path)
 
-# Do work
+# Do work, only the matching messages get decoded
 matching_messages_list = []
-for afile in hl7_log_files:
-    filepath = os.path.join(path, afile)
-    with open(filepath, 'r') as f:
-        read_data = f.read()
-        hl7_list = read_data.split('======')
-        filtered_hl7_list = list(filter(lambda k: searchterm in k, hl7_list))
-        matching_messages_list = [*matching_messages_list, *filtered_hl7_list]
+for filepath, hl7_list in hl7_search.search_files(hl7_log_files, searchterm):
+    for hl7message in hl7_list:
+        matching_messages_list.append(hl7_search.fix_line_endings(hl7message).decode('utf-8', errors='replace'))
 
 # Output the data to an excel sheet            
 df = pd.DataFrame({'messages':matching_messages_list})